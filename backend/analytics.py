@@ -1,8 +1,8 @@
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta, date
 from typing import List, Dict, Any, Optional, Tuple
 from collections import defaultdict, Counter
+from uuid import UUID
 from motor.motor_asyncio import AsyncIOMotorDatabase
 import asyncio
 from models import (
@@ -10,6 +10,76 @@ from models import (
     CustomerRiskProfile, RiskLevel, ReturnReason, QueryFilter
 )
 
+ONE_DAY = timedelta(days=1)
+
+# Returns within this long of delivery are flagged as rapid returns at ingestion
+RAPID_RETURN_HOURS = 24
+
+# Risk levels indexed by the codes returned from the fraud score kernel
+RISK_LEVELS_BY_CODE = (RiskLevel.LOW, RiskLevel.MEDIUM, RiskLevel.HIGH, RiskLevel.CRITICAL)
+
+def _fraud_score_kernel(return_rate, recent_returns, avg_return_value, rapid_returns, suspicious_reasons,
+                        return_rate_threshold, frequent_threshold, high_value_threshold):
+    """Score customers in one fused loop, returning clamped scores and risk codes (0=low .. 3=critical)"""
+    
+    count = return_rate.shape[0]
+    scores = np.empty(count, dtype=np.float64)
+    risk_codes = np.empty(count, dtype=np.int8)
+    
+    for i in range(count):
+        score = 0.0
+        if return_rate[i] > return_rate_threshold:
+            score += min(30.0, return_rate[i] * 100)
+        if recent_returns[i] > frequent_threshold:
+            score += min(25.0, recent_returns[i] * 4)
+        if avg_return_value[i] > high_value_threshold:
+            score += min(20.0, (avg_return_value[i] / high_value_threshold) * 10)
+        if rapid_returns[i] > 0:
+            score += min(15.0, rapid_returns[i] * 7)
+        if suspicious_reasons[i] > 2:
+            score += min(10.0, suspicious_reasons[i] * 2)
+        
+        if score >= 70:
+            risk_codes[i] = 3
+        elif score >= 50:
+            risk_codes[i] = 2
+        elif score >= 25:
+            risk_codes[i] = 1
+        else:
+            risk_codes[i] = 0
+        scores[i] = min(100.0, score)
+    
+    return scores, risk_codes
+
+# Explicit signature so Numba compiles once up front instead of on the first call
+FRAUD_SCORE_KERNEL_SIGNATURE = (
+    "Tuple((float64[:], int8[:]))"
+    "(float64[:], float64[:], float64[:], float64[:], float64[:], float64, float64, float64)"
+)
+
+# JIT-compiled kernel, set by compile_fraud_score_kernel(); scoring uses NumPy until then
+fraud_score_kernel = None
+
+def compile_fraud_score_kernel():
+    """Import Numba and compile the fraud score kernel, keeping the NumPy fallback if Numba is missing"""
+    
+    global fraud_score_kernel
+    try:
+        from numba import njit
+    except ImportError:  # Numba is optional; fraud scoring falls back to NumPy
+        return
+    fraud_score_kernel = njit(FRAUD_SCORE_KERNEL_SIGNATURE, cache=True)(_fraud_score_kernel)
+
+def build_date_range(start_date: Optional[date], end_date: Optional[date]) -> Dict[str, datetime]:
+    """Build a Mongo range condition covering whole days from start_date through end_date"""
+    
+    date_range = {}
+    if start_date:
+        date_range["$gte"] = datetime(start_date.year, start_date.month, start_date.day)
+    if end_date:
+        date_range["$lt"] = datetime(end_date.year, end_date.month, end_date.day) + ONE_DAY
+    return date_range
+
 class FraudDetectionEngine:
     """Advanced fraud detection engine for e-commerce returns"""
     
@@ -20,95 +90,137 @@ class FraudDetectionEngine:
         self.RETURN_RATE_THRESHOLD = 0.3  # 30% return rate is suspicious
         self.HIGH_VALUE_RETURN_THRESHOLD = 500.0  # Returns above $500
         self.FREQUENT_RETURNER_THRESHOLD = 5  # More than 5 returns in 30 days
-        self.RAPID_RETURN_HOURS = 24  # Returns within 24 hours of delivery
-        self.SUSPICIOUS_REASON_PATTERNS = ['changed_mind', 'not_as_described']
+        self.SUSPICIOUS_REASON_PATTERNS = frozenset({'changed_mind', 'not_as_described'})
+        self.PATTERN_LOOKBACK_DAYS = 90  # Window scanned by system-wide pattern detection
+        
+    async def calculate_fraud_score(self, customer_id: UUID,
+                                    customer_data: Optional[Dict[str, Any]] = None) -> Tuple[float, List[str], RiskLevel]:
+        """Calculate comprehensive fraud score for a customer, reusing pre-fetched analytics data if given"""
         
-    async def calculate_fraud_score(self, customer_id: str) -> Tuple[float, List[str], RiskLevel]:
-        """Calculate comprehensive fraud score for a customer"""
+        if customer_data is None:
+            customer_data = await self._get_customer_analytics_data(customer_id)
+        return self._score_customer_data(customer_data)
+    
+    async def calculate_fraud_scores(self, customer_ids: List[UUID]) -> List[Tuple[float, List[str], RiskLevel]]:
+        """Calculate fraud scores for many customers from one round of bulk aggregations"""
+        
+        analytics = await self._get_bulk_customer_analytics_data(customer_ids)
+        return self._score_customers([analytics[customer_id] for customer_id in customer_ids])
+    
+    def _score_customer_data(self, customer_data: Dict[str, Any]) -> Tuple[float, List[str], RiskLevel]:
+        """Score a customer from already-computed analytics data"""
         
-        customer_data = await self._get_customer_analytics_data(customer_id)
-        if not customer_data:
-            return 0.0, [], RiskLevel.LOW
+        return self._score_customers([customer_data])[0]
             
-        score = 0.0
-        indicators = []
+    def _score_customers(self, customers_data: List[Dict[str, Any]]) -> List[Tuple[float, List[str], RiskLevel]]:
+        """Score many customers at once with vectorized NumPy component scores"""
+        
+        count = len(customers_data)
+        if not count:
+            return []
+        
+        def column(key: str) -> np.ndarray:
+            return np.fromiter((d.get(key, 0) for d in customers_data), dtype=np.float64, count=count)
+        
+        return_rate = column('return_rate')
+        recent_returns = column('recent_returns_30d')
+        avg_return_value = column('avg_return_value')
+        rapid_returns = column('rapid_returns')
+        suspicious_reasons = column('suspicious_reason_count')
         
         # 1. Return Rate Analysis (0-30 points)
-        return_rate = customer_data.get('return_rate', 0)
-        if return_rate > self.RETURN_RATE_THRESHOLD:
-            score += min(30, return_rate * 100)
-            indicators.append(f"High return rate: {return_rate:.2%}")
-            
+        high_rate = return_rate > self.RETURN_RATE_THRESHOLD
         # 2. Return Frequency (0-25 points)
-        recent_returns = customer_data.get('recent_returns_30d', 0)
-        if recent_returns > self.FREQUENT_RETURNER_THRESHOLD:
-            score += min(25, recent_returns * 4)
-            indicators.append(f"Frequent returner: {recent_returns} returns in 30 days")
-            
+        frequent = recent_returns > self.FREQUENT_RETURNER_THRESHOLD
         # 3. Return Value Patterns (0-20 points)
-        avg_return_value = customer_data.get('avg_return_value', 0)
-        if avg_return_value > self.HIGH_VALUE_RETURN_THRESHOLD:
-            score += min(20, (avg_return_value / self.HIGH_VALUE_RETURN_THRESHOLD) * 10)
-            indicators.append(f"High-value returns: avg ${avg_return_value:.2f}")
-            
+        high_value = avg_return_value > self.HIGH_VALUE_RETURN_THRESHOLD
         # 4. Rapid Returns (0-15 points)
-        rapid_returns = customer_data.get('rapid_returns', 0)
-        if rapid_returns > 0:
-            score += min(15, rapid_returns * 7)
-            indicators.append(f"Rapid returns: {rapid_returns} returns within 24h of delivery")
-            
+        rapid = rapid_returns > 0
         # 5. Suspicious Reason Patterns (0-10 points)
-        suspicious_reasons = customer_data.get('suspicious_reason_count', 0)
-        if suspicious_reasons > 2:
-            score += min(10, suspicious_reasons * 2)
-            indicators.append(f"Suspicious return reasons: {suspicious_reasons} occurrences")
+        suspicious = suspicious_reasons > 2
             
-        # Determine risk level
-        if score >= 70:
-            risk_level = RiskLevel.CRITICAL
-        elif score >= 50:
-            risk_level = RiskLevel.HIGH
-        elif score >= 25:
-            risk_level = RiskLevel.MEDIUM
+        if fraud_score_kernel is not None:
+            # JIT-compiled fast path: one fused loop, no temporary arrays
+            scores, risk_codes = fraud_score_kernel(
+                return_rate, recent_returns, avg_return_value, rapid_returns, suspicious_reasons,
+                self.RETURN_RATE_THRESHOLD, self.FREQUENT_RETURNER_THRESHOLD, self.HIGH_VALUE_RETURN_THRESHOLD
+            )
+            risk_levels = [RISK_LEVELS_BY_CODE[code] for code in risk_codes]
         else:
-            risk_level = RiskLevel.LOW
+            scores = (
+                np.where(high_rate, np.minimum(30, return_rate * 100), 0.0)
+                + np.where(frequent, np.minimum(25, recent_returns * 4), 0.0)
+                + np.where(high_value, np.minimum(20, (avg_return_value / self.HIGH_VALUE_RETURN_THRESHOLD) * 10), 0.0)
+                + np.where(rapid, np.minimum(15, rapid_returns * 7), 0.0)
+                + np.where(suspicious, np.minimum(10, suspicious_reasons * 2), 0.0)
+            )
+            
+            # Determine risk level
+            risk_levels = [RiskLevel(level) for level in np.select(
+                [scores >= 70, scores >= 50, scores >= 25],
+                [RiskLevel.CRITICAL.value, RiskLevel.HIGH.value, RiskLevel.MEDIUM.value],
+                default=RiskLevel.LOW.value
+            )]
+            scores = np.minimum(100.0, scores)
+            
+        results = []
+        for i, customer_data in enumerate(customers_data):
+            indicators = []
+            if high_rate[i]:
+                indicators.append(f"High return rate: {customer_data['return_rate']:.2%}")
+            if frequent[i]:
+                indicators.append(f"Frequent returner: {customer_data['recent_returns_30d']} returns in 30 days")
+            if high_value[i]:
+                indicators.append(f"High-value returns: avg ${customer_data['avg_return_value']:.2f}")
+            if rapid[i]:
+                indicators.append(f"Rapid returns: {customer_data['rapid_returns']} returns within 24h of delivery")
+            if suspicious[i]:
+                indicators.append(f"Suspicious return reasons: {customer_data['suspicious_reason_count']} occurrences")
             
-        return min(100.0, score), indicators, risk_level
+            results.append((float(scores[i]), indicators, risk_levels[i]))
+        
+        return results
     
-    async def _get_customer_analytics_data(self, customer_id: str) -> Dict[str, Any]:
+    async def _get_customer_analytics_data(self, customer_id: UUID) -> Dict[str, Any]:
         """Get comprehensive customer analytics data"""
         
-        # Get orders
-        orders = await self.db.orders.find({"customer_id": customer_id}).to_list(1000)
-        returns = await self.db.returns.find({"customer_id": customer_id}).to_list(1000)
+        # Get order count and returns concurrently
+        total_orders, returns = await asyncio.gather(
+            self.db.orders.count_documents({"customer_id": customer_id}),
+            self.db.returns.find(
+                {"customer_id": customer_id},
+                projection={"_id": 0, "return_date": 1, "refund_amount": 1, "reason": 1, "is_rapid_return": 1},
+                batch_size=1000
+            ).to_list(1000)
+        )
         
-        if not orders:
+        if not total_orders:
             return {}
             
-        total_orders = len(orders)
         total_returns = len(returns)
         return_rate = total_returns / total_orders if total_orders > 0 else 0
         
+        # Load the numeric return columns into NumPy arrays once
+        return_dates = np.fromiter((r['return_date'] for r in returns), dtype='datetime64[us]', count=total_returns)
+        return_values = np.fromiter((r['refund_amount'] for r in returns), dtype=np.float64, count=total_returns)
+
         # Calculate recent returns (last 30 days)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_returns = len([r for r in returns if r['return_date'] >= thirty_days_ago])
-        
+        thirty_days_ago = np.datetime64(datetime.utcnow() - timedelta(days=30), 'us')
+        recent_returns = int(np.count_nonzero(return_dates >= thirty_days_ago))
+
         # Calculate average return value
-        return_values = [r['refund_amount'] for r in returns]
-        avg_return_value = sum(return_values) / len(return_values) if return_values else 0
-        
-        # Count rapid returns (within 24 hours of delivery)
-        rapid_returns = 0
-        for ret in returns:
-            order = next((o for o in orders if o['id'] == ret['order_id']), None)
-            if order and order.get('status') == 'delivered':
-                delivery_date = order.get('updated_at', order['order_date'])
-                if ret['return_date'] <= delivery_date + timedelta(hours=24):
-                    rapid_returns += 1
-        
-        # Count suspicious reason patterns
-        reason_counts = Counter([r['reason'] for r in returns])
-        suspicious_reasons = sum([reason_counts[reason] for reason in self.SUSPICIOUS_REASON_PATTERNS])
+        avg_return_value = float(return_values.mean()) if total_returns else 0
+        
+        # Count rapid returns (within 24 hours of delivery, flagged at ingestion)
+        rapid_returns = sum(1 for r in returns if r.get('is_rapid_return'))
+        
+        # Count return reasons and suspicious reason patterns in one pass
+        reason_counts = Counter()
+        suspicious_reasons = 0
+        for r in returns:
+            reason = r['reason']
+            reason_counts[reason] += 1
+            suspicious_reasons += reason in self.SUSPICIOUS_REASON_PATTERNS
         
         return {
             'total_orders': total_orders,
@@ -121,6 +233,66 @@ class FraudDetectionEngine:
             'return_reasons': dict(reason_counts)
         }
     
+    async def _get_bulk_customer_analytics_data(self, customer_ids: List[UUID]) -> Dict[UUID, Dict[str, Any]]:
+        """Get customer analytics data for many customers with one aggregation per collection"""
+        
+        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+        
+        # Per-(customer, reason) rollup, then per-customer rollup
+        pipeline = [
+            {"$match": {"customer_id": {"$in": customer_ids}}},
+            {"$project": {
+                "_id": 0, "customer_id": 1, "reason": 1, "return_date": 1,
+                "refund_amount": 1, "is_rapid_return": 1
+            }},
+            {"$group": {
+                "_id": {"customer_id": "$customer_id", "reason": "$reason"},
+                "count": {"$sum": 1},
+                "recent": {"$sum": {"$cond": [{"$gte": ["$return_date", thirty_days_ago]}, 1, 0]}},
+                "refund_total": {"$sum": "$refund_amount"},
+                "rapid": {"$sum": {"$cond": ["$is_rapid_return", 1, 0]}}
+            }},
+            {"$group": {
+                "_id": "$_id.customer_id",
+                "total_returns": {"$sum": "$count"},
+                "recent_returns_30d": {"$sum": "$recent"},
+                "refund_total": {"$sum": "$refund_total"},
+                "rapid_returns": {"$sum": "$rapid"},
+                "suspicious_reason_count": {"$sum": {
+                    "$cond": [{"$in": ["$_id.reason", sorted(self.SUSPICIOUS_REASON_PATTERNS)]}, "$count", 0]
+                }},
+                "reasons": {"$push": {"reason": "$_id.reason", "count": "$count"}}
+            }}
+        ]
+        
+        order_counts, return_results = await asyncio.gather(
+            self._count_by_customer(self.db.orders, customer_ids),
+            self.db.returns.aggregate(pipeline).to_list(None)
+        )
+        return_stats = {result['_id']: result for result in return_results}
+        
+        analytics = {}
+        for customer_id in customer_ids:
+            total_orders = order_counts.get(customer_id, 0)
+            if not total_orders:
+                analytics[customer_id] = {}
+                continue
+            
+            stats = return_stats.get(customer_id)
+            total_returns = stats['total_returns'] if stats else 0
+            analytics[customer_id] = {
+                'total_orders': total_orders,
+                'total_returns': total_returns,
+                'return_rate': total_returns / total_orders,
+                'recent_returns_30d': stats['recent_returns_30d'] if stats else 0,
+                'avg_return_value': stats['refund_total'] / total_returns if stats else 0,
+                'rapid_returns': stats['rapid_returns'] if stats else 0,
+                'suspicious_reason_count': stats['suspicious_reason_count'] if stats else 0,
+                'return_reasons': {r['reason']: r['count'] for r in stats['reasons']} if stats else {}
+            }
+        
+        return analytics
+    
     async def detect_anomalies(self) -> List[FraudPattern]:
         """Detect system-wide fraud patterns and anomalies"""
         
@@ -162,7 +334,7 @@ class FraudDetectionEngine:
         
         for result in results:
             pattern = FraudPattern(
-                customer_id=result['_id'],
+                customer_id=str(result['_id']),
                 pattern_type="mass_return_event",
                 description=f"Customer has {result['return_count']} returns in 7 days totaling ${result['total_refund']:.2f}",
                 severity=RiskLevel.HIGH,
@@ -180,9 +352,11 @@ class FraudDetectionEngine:
         """Detect potential coordinated fraud through shipping address analysis"""
         
         patterns = []
+        lookback_start = datetime.utcnow() - timedelta(days=self.PATTERN_LOOKBACK_DAYS)
         
         # Find multiple customers using same shipping address with high return rates
         pipeline = [
+            {"$match": {"order_date": {"$gte": lookback_start}}},
             {"$group": {
                 "_id": "$shipping_address",
                 "customers": {"$addToSet": "$customer_id"},
@@ -193,6 +367,15 @@ class FraudDetectionEngine:
         ]
         
         results = await self.db.orders.aggregate(pipeline).to_list(100)
+        if not results:
+            return patterns
+        
+        # Fetch order and return counts for every suspect customer in one pass
+        suspect_ids = list({cid for result in results for cid in result['customers']})
+        orders_by_customer, returns_by_customer = await asyncio.gather(
+            self._count_by_customer(self.db.orders, suspect_ids),
+            self._count_by_customer(self.db.returns, suspect_ids)
+        )
         
         for result in results:
             # Check return rates for these customers
@@ -200,8 +383,8 @@ class FraudDetectionEngine:
             return_counts = []
             
             for customer_id in customer_ids:
-                customer_returns = await self.db.returns.count_documents({"customer_id": customer_id})
-                customer_orders = await self.db.orders.count_documents({"customer_id": customer_id})
+                customer_returns = returns_by_customer.get(customer_id, 0)
+                customer_orders = orders_by_customer.get(customer_id, 0)
                 return_rate = customer_returns / customer_orders if customer_orders > 0 else 0
                 return_counts.append(return_rate)
             
@@ -209,7 +392,7 @@ class FraudDetectionEngine:
             
             if avg_return_rate > 0.2:  # Average return rate > 20%
                 pattern = FraudPattern(
-                    customer_id=customer_ids[0],  # Primary customer
+                    customer_id=str(customer_ids[0]),  # Primary customer
                     pattern_type="potential_fraud_ring",
                     description=f"Multiple customers ({len(customer_ids)}) using same address with {avg_return_rate:.1%} avg return rate",
                     severity=RiskLevel.CRITICAL,
@@ -224,13 +407,26 @@ class FraudDetectionEngine:
                 
         return patterns
     
+    async def _count_by_customer(self, collection, customer_ids: List[UUID]) -> Dict[UUID, int]:
+        """Count documents per customer for the given customer ids"""
+        
+        pipeline = [
+            {"$match": {"customer_id": {"$in": customer_ids}}},
+            {"$group": {"_id": "$customer_id", "count": {"$sum": 1}}}
+        ]
+        
+        results = await collection.aggregate(pipeline).to_list(None)
+        return {result['_id']: result['count'] for result in results}
+    
     async def _detect_product_return_abuse(self) -> List[FraudPattern]:
         """Detect products with suspicious return patterns"""
         
         patterns = []
+        lookback_start = datetime.utcnow() - timedelta(days=self.PATTERN_LOOKBACK_DAYS)
         
         # Group returns by product
         pipeline = [
+            {"$match": {"return_date": {"$gte": lookback_start}}},
             {"$group": {
                 "_id": "$product_id",
                 "return_count": {"$sum": 1},
@@ -246,7 +442,8 @@ class FraudDetectionEngine:
         for result in results:
             # Calculate product return rate
             total_orders = await self.db.orders.count_documents({
-                "items.product_id": result['_id']
+                "items.product_id": result['_id'],
+                "order_date": {"$gte": lookback_start}
             })
             return_rate = result['return_count'] / total_orders if total_orders > 0 else 0
             
@@ -277,56 +474,81 @@ class AnalyticsEngine:
         self.db = db
         self.fraud_engine = FraudDetectionEngine(db)
     
+        # Daily slopes within +/- this many events per day count as "stable"
+        self.TREND_SLOPE_THRESHOLD = 0.01
+    
     async def get_dashboard_metrics(self, filters: Optional[QueryFilter] = None) -> AnalyticsMetrics:
         """Get key metrics for the dashboard"""
         
         # Build date filter
-        date_filter = {}
-        if filters:
-            if filters.start_date:
-                date_filter["$gte"] = datetime.combine(filters.start_date, datetime.min.time())
-            if filters.end_date:
-                date_filter["$lte"] = datetime.combine(filters.end_date, datetime.max.time())
+        date_filter = build_date_range(filters.start_date, filters.end_date) if filters else {}
         
         order_filter = {"order_date": date_filter} if date_filter else {}
         return_filter = {"return_date": date_filter} if date_filter else {}
+        refund_filter = {"requested_date": date_filter} if date_filter else {}
+        
+        # Orders: count and revenue in one pass over the filtered range
+        order_pipeline = [
+            {"$match": order_filter},
+            {"$group": {"_id": None, "count": {"$sum": 1}, "revenue": {"$sum": "$total_amount"}}}
+        ]
+        
+        # Returns: filtered count, fraud count and top reasons in one round-trip
+        return_pipeline = [
+            {"$facet": {
+                "total": [{"$match": return_filter}, {"$count": "count"}],
+                "fraud": [{"$match": {"is_fraud_suspected": True}}, {"$count": "count"}],
+                "top_reasons": [
+                    {"$group": {"_id": "$reason", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1}},
+                    {"$limit": 5}
+                ]
+            }}
+        ]
+        
+        # Refunds: count, amount and processing time in one round-trip over the filtered range
+        refund_pipeline = [
+            {"$match": refund_filter},
+            {"$facet": {
+                "totals": [{"$group": {"_id": None, "count": {"$sum": 1}, "amount": {"$sum": "$amount"}}}],
+                "processing": [
+                    {"$match": {"status": "processed", "processing_time_days": {"$gt": 0}}},
+                    {"$group": {"_id": None, "avg": {"$avg": "$processing_time_days"}}}
+                ]
+            }}
+        ]
+        
+        order_results, return_results, refund_results, high_risk_customers = await asyncio.gather(
+            self.db.orders.aggregate(order_pipeline).to_list(1),
+            self.db.returns.aggregate(return_pipeline).to_list(1),
+            self.db.refunds.aggregate(refund_pipeline).to_list(1),
+            self.db.customers.count_documents({"risk_level": "high"})
+        )
+        order_stats = order_results[0] if order_results else {}
+        return_facets = return_results[0]
+        refund_facets = refund_results[0]
         
         # Get basic counts
-        total_orders = await self.db.orders.count_documents(order_filter)
-        total_returns = await self.db.returns.count_documents(return_filter)
-        total_refunds = await self.db.refunds.count_documents({})
+        total_orders = order_stats.get('count', 0)
+        total_returns = self._facet_value(return_facets, 'total', 'count')
+        total_refunds = self._facet_value(refund_facets, 'totals', 'count')
         
         # Calculate rates
         overall_return_rate = total_returns / total_orders if total_orders > 0 else 0
         
         # Get fraud detection metrics
-        high_risk_customers = await self.db.customers.count_documents({"risk_level": "high"})
-        fraud_suspected_returns = await self.db.returns.count_documents({"is_fraud_suspected": True})
+        fraud_suspected_returns = self._facet_value(return_facets, 'fraud', 'count')
         fraud_detection_rate = fraud_suspected_returns / total_returns if total_returns > 0 else 0
         
         # Calculate processing times
-        processed_refunds = await self.db.refunds.find({"status": "processed"}).to_list(1000)
-        processing_times = []
-        for refund in processed_refunds:
-            if refund.get('processing_time_days'):
-                processing_times.append(refund['processing_time_days'])
-        avg_processing_time = sum(processing_times) / len(processing_times) if processing_times else 0
+        avg_processing_time = self._facet_value(refund_facets, 'processing', 'avg')
         
         # Calculate revenue metrics
-        orders = await self.db.orders.find(order_filter).to_list(10000)
-        total_revenue = sum([order['total_amount'] for order in orders])
-        
-        refunds = await self.db.refunds.find({}).to_list(10000)
-        total_refund_amount = sum([refund['amount'] for refund in refunds])
+        total_revenue = order_stats.get('revenue', 0)
+        total_refund_amount = self._facet_value(refund_facets, 'totals', 'amount')
         
         # Top return reasons
-        return_reasons_pipeline = [
-            {"$group": {"_id": "$reason", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 5}
-        ]
-        reason_results = await self.db.returns.aggregate(return_reasons_pipeline).to_list(5)
-        top_return_reasons = {result['_id']: result['count'] for result in reason_results}
+        top_return_reasons = {result['_id']: result['count'] for result in return_facets['top_reasons']}
         
         # Date range
         date_range = {}
@@ -350,37 +572,54 @@ class AnalyticsEngine:
             date_range=date_range
         )
     
+    @staticmethod
+    def _facet_value(facets: Dict[str, List[Dict[str, Any]]], facet: str, field: str) -> Any:
+        """Read a single value from a $facet result, defaulting to 0 for empty facets"""
+        
+        results = facets.get(facet)
+        return results[0][field] if results else 0
+    
     async def get_customer_risk_profiles(self, limit: int = 100) -> List[CustomerRiskProfile]:
         """Get customer risk profiles for fraud analysis"""
         
-        customers = await self.db.customers.find().limit(limit).to_list(limit)
-        profiles = []
+        customers = await self.db.customers.find(projection={"_id": 0, "id": 1, "email": 1}).limit(limit).batch_size(limit).to_list(limit)
         
-        for customer in customers:
-            # Get customer analytics data
-            customer_data = await self.fraud_engine._get_customer_analytics_data(customer['id'])
-            
-            # Calculate risk metrics
-            fraud_score, indicators, risk_level = await self.fraud_engine.calculate_fraud_score(customer['id'])
-            
-            # Generate recommendation
-            recommendation = self._generate_customer_recommendation(risk_level, indicators)
-            
-            profile = CustomerRiskProfile(
-                customer_id=customer['id'],
-                email=customer['email'],
-                risk_score=fraud_score,
-                risk_level=risk_level,
-                return_frequency=customer_data.get('recent_returns_30d', 0),
-                avg_order_value=customer_data.get('avg_return_value', 0),
-                return_value_ratio=customer_data.get('return_rate', 0),
-                suspicious_patterns=indicators,
-                recommendation=recommendation
-            )
-            profiles.append(profile)
+        # Fetch analytics data for every customer in one round of aggregations
+        analytics = await self.fraud_engine._get_bulk_customer_analytics_data([c['id'] for c in customers])
+        customers_data = [analytics[c['id']] for c in customers]
+        
+        # Calculate risk metrics for the whole batch at once
+        scores = self.fraud_engine._score_customers(customers_data)
+        
+        profiles = [
+            self._build_risk_profile(customer, customer_data, score)
+            for customer, customer_data, score in zip(customers, customers_data, scores)
+        ]
         
         return sorted(profiles, key=lambda x: x.risk_score, reverse=True)
     
+    def _build_risk_profile(self, customer: Dict[str, Any], customer_data: Dict[str, Any],
+                            score: Tuple[float, List[str], RiskLevel]) -> CustomerRiskProfile:
+        """Build a risk profile for one customer from its analytics data and fraud score"""
+        
+        fraud_score, indicators, risk_level = score
+        
+        # Generate recommendation
+        recommendation = self._generate_customer_recommendation(risk_level, indicators)
+        
+        # Every field is computed here, so skip Pydantic validation
+        return CustomerRiskProfile.model_construct(
+            customer_id=customer['id'],
+            email=customer['email'],
+            risk_score=fraud_score,
+            risk_level=risk_level,
+            return_frequency=customer_data.get('recent_returns_30d', 0),
+            avg_order_value=customer_data.get('avg_return_value', 0),
+            return_value_ratio=customer_data.get('return_rate', 0),
+            suspicious_patterns=indicators,
+            recommendation=recommendation
+        )
+    
     def _generate_customer_recommendation(self, risk_level: RiskLevel, indicators: List[str]) -> str:
         """Generate actionable recommendations based on risk assessment"""
         
@@ -414,16 +653,26 @@ class AnalyticsEngine:
         daily_trends = await self.db.returns.aggregate(pipeline).to_list(days)
         
         # Calculate trend indicators
-        return_counts = [day['return_count'] for day in daily_trends]
-        fraud_counts = [day['fraud_count'] for day in daily_trends]
-        
-        return_trend = "increasing" if len(return_counts) > 1 and return_counts[-1] > return_counts[0] else "stable"
-        fraud_trend = "increasing" if len(fraud_counts) > 1 and fraud_counts[-1] > fraud_counts[0] else "stable"
+        return_counts = np.fromiter((day['return_count'] for day in daily_trends), dtype=np.float64, count=len(daily_trends))
+        fraud_counts = np.fromiter((day['fraud_count'] for day in daily_trends), dtype=np.float64, count=len(daily_trends))
         
         return {
             "daily_trends": daily_trends,
-            "return_trend": return_trend,
-            "fraud_trend": fraud_trend,
-            "avg_daily_returns": sum(return_counts) / len(return_counts) if return_counts else 0,
-            "avg_daily_fraud": sum(fraud_counts) / len(fraud_counts) if fraud_counts else 0
-        }
\ No newline at end of file
+            "return_trend": self._classify_trend(return_counts),
+            "fraud_trend": self._classify_trend(fraud_counts),
+            "avg_daily_returns": float(return_counts.mean()) if return_counts.size else 0,
+            "avg_daily_fraud": float(fraud_counts.mean()) if fraud_counts.size else 0
+        }
+    
+    def _classify_trend(self, counts: np.ndarray) -> str:
+        """Label a daily series by the sign of its least-squares slope"""
+        
+        if counts.size < 2:
+            return "stable"
+        
+        slope = np.polyfit(np.arange(counts.size), counts, 1)[0]
+        if slope > self.TREND_SLOPE_THRESHOLD:
+            return "increasing"
+        elif slope < -self.TREND_SLOPE_THRESHOLD:
+            return "decreasing"
+        return "stable"
\ No newline at end of file
@@ -0,0 +1,66 @@
+import asyncio
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+_MISSING = object()
+
+class TTLCache:
+    """In-process LRU cache whose entries expire after a fixed number of seconds"""
+    
+    def __init__(self, ttl: float = 30.0, maxsize: int = 256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+    
+    async def get_or_set(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, awaiting factory() to fill it when missing or expired
+        
+        Concurrent misses for the same key share a single in-flight factory() call.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._pending[key] = task
+            task.add_done_callback(partial(self._store, key))
+        
+        # Shield so one cancelled caller doesn't cancel the work others are waiting on
+        return await asyncio.shield(task)
+    
+    def _store(self, key: Hashable, task: asyncio.Future):
+        """Cache a finished factory result unless it failed or the cache was cleared meanwhile"""
+        failed = task.cancelled() or task.exception() is not None
+        if self._pending.get(key) is not task:
+            return
+        del self._pending[key]
+        if not failed:
+            self.set(key, task.result())
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default when it is missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return default
+        self._entries.move_to_end(key)
+        return entry[1]
+    
+    def set(self, key: Hashable, value: Any):
+        """Cache value under key for the next ttl seconds"""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        
+        # Evict least recently used entries beyond maxsize
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Drop every cached entry and forget in-flight computations"""
+        self._entries.clear()
+        self._pending.clear()
+    
\ No newline at end of file
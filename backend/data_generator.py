@@ -1,22 +1,61 @@
 import random
 import string
+import math
+from itertools import islice
+import numpy as np
 from datetime import datetime, timedelta
 from faker import Faker
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Tuple
 import asyncio
+import uuid
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from models import (
-    Customer, Product, Seller, Order, OrderItem, Return, Refund,
-    OrderStatus, ReturnReason, RefundStatus, RiskLevel
-)
+from models import OrderStatus, ReturnReason, RefundStatus, RiskLevel
+from analytics import RAPID_RETURN_HOURS
 
 fake = Faker()
 
+# Concurrent insert_many calls per collection (kept well below the driver pool size)
+INSERT_CONCURRENCY = 4
+
+# Distinct return descriptions generated up front and reused across returns
+DESCRIPTION_POOL_SIZE = 500
+
+# Enum values as plain strings so hot loops skip per-row enum member handling
+ORDER_STATUS_CHOICES = (OrderStatus.DELIVERED.value, OrderStatus.SHIPPED.value)
+REFUND_STATUS_CHOICES = (RefundStatus.PROCESSED.value, RefundStatus.APPROVED.value)
+PAYMENT_METHODS = ('Credit Card', 'Debit Card', 'PayPal', 'Apple Pay')
+REFUND_METHODS = ('Original Payment Method', 'Store Credit', 'Bank Transfer')
+
+# Delivery-to-return window within which a return is flagged as rapid
+RAPID_RETURN_WINDOW = timedelta(hours=RAPID_RETURN_HOURS)
+
+# Product price range for categories without a dedicated entry
+DEFAULT_PRICE_RANGE = (10, 500)
+
+def algorithm_l_sample(iterable: Iterable, k: int) -> List:
+    """Uniformly sample k items from an iterable in a single pass (reservoir Algorithm L)"""
+    iterator = iter(iterable)
+    reservoir = list(islice(iterator, k))
+    if len(reservoir) < k or k <= 0:
+        return reservoir
+    
+    # Jump ahead by geometrically distributed gaps instead of drawing per item
+    weight = math.exp(math.log(1.0 - random.random()) / k)
+    while True:
+        skip = math.floor(math.log(1.0 - random.random()) / math.log(1.0 - weight))
+        try:
+            item = next(islice(iterator, skip, None))
+        except StopIteration:
+            return reservoir
+        reservoir[random.randrange(k)] = item
+        weight *= math.exp(math.log(1.0 - random.random()) / k)
+
 class ECommerceDataGenerator:
     """Generate realistic e-commerce data for demonstration purposes"""
     
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
+        self.rng = np.random.default_rng()
         
         # Product categories and subcategories
         self.categories = {
@@ -27,6 +66,16 @@ class ECommerceDataGenerator:
             "Beauty": ["Skincare", "Makeup", "Hair Care", "Fragrance", "Personal Care"]
         }
         
+        # Category lookups precomputed once so product generation only indexes into them
+        self._cat_keys = tuple(self.categories)
+        self._subcategories = tuple(tuple(subs) for subs in self.categories.values())
+        self._price_ranges = {"Electronics": (50, 2000), "Clothing": (15, 300)}
+        price_bounds = np.array(
+            [self._price_ranges.get(category, DEFAULT_PRICE_RANGE) for category in self._cat_keys],
+            dtype=np.float64
+        )
+        self._price_low, self._price_high = price_bounds[:, 0], price_bounds[:, 1]
+        
         # Return reasons with fraud likelihood weights
         self.return_reasons_weights = {
             ReturnReason.DEFECTIVE: 0.15,
@@ -38,6 +87,20 @@ class ECommerceDataGenerator:
             ReturnReason.DUPLICATE_ORDER: 0.05
         }
         
+        # High-risk customers more likely to use suspicious reasons
+        self.high_risk_return_reasons_weights = {
+            ReturnReason.CHANGED_MIND: 0.4,
+            ReturnReason.NOT_AS_DESCRIBED: 0.3,
+            ReturnReason.SIZE_ISSUE: 0.15,
+            ReturnReason.DEFECTIVE: 0.15
+        }
+        
+        # Reason choices and normalized probabilities for batch sampling
+        self.reason_distributions = {
+            'high_risk': self._to_distribution(self.high_risk_return_reasons_weights),
+            'default': self._to_distribution(self.return_reasons_weights)
+        }
+        
         # Fraud probability by return reason
         self.fraud_probability = {
             ReturnReason.CHANGED_MIND: 0.4,
@@ -49,6 +112,24 @@ class ECommerceDataGenerator:
             ReturnReason.DUPLICATE_ORDER: 0.01
         }
     
+    @staticmethod
+    def _to_distribution(weights: Dict[ReturnReason, float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Split reason weights into an object array of reason values and probabilities summing to 1"""
+        reasons = np.array([reason.value for reason in weights], dtype=object)
+        probabilities = np.fromiter(weights.values(), dtype=np.float64, count=len(weights))
+        return reasons, probabilities / probabilities.sum()
+    
+    def _sample_return_reasons(self, risk_profiles: List[str]) -> List[str]:
+        """Draw one return reason per risk profile in a single call per distribution"""
+        high_risk = np.array([profile == 'high_risk' for profile in risk_profiles], dtype=bool)
+        reasons = np.empty(len(risk_profiles), dtype=object)
+        
+        for key, mask in (('high_risk', high_risk), ('default', ~high_risk)):
+            choices, probabilities = self.reason_distributions[key]
+            reasons[mask] = self.rng.choice(choices, size=int(mask.sum()), p=probabilities)
+        
+        return reasons.tolist()
+    
     async def generate_sample_data(self, 
                                  customers: int = 1000,
                                  sellers: int = 50,
@@ -58,19 +139,30 @@ class ECommerceDataGenerator:
         """Generate comprehensive sample e-commerce data"""
         
         print("Starting data generation...")
+        returns_count = int(orders * return_rate)
         
-        # Clear existing data
+        # Build Faker text pools in a worker thread while existing data is cleared
+        pools_task = asyncio.create_task(
+            asyncio.to_thread(self._prebuild_pools, sellers, customers, orders, returns_count)
+        )
         await self._clear_existing_data()
+        pools = await pools_task
+        
+        # Customer risk personas, kept in memory only to seed order and return generation
+        risk_by_customer_id: Dict[uuid.UUID, str] = {}
         
-        # Generate base data
-        generated_sellers = await self._generate_sellers(sellers)
+        # Generate base data (sellers and customers are independent)
+        generated_sellers, generated_customers = await asyncio.gather(
+            self._generate_sellers(sellers, pools),
+            self._generate_customers(customers, pools, risk_by_customer_id)
+        )
         generated_products = await self._generate_products(products, generated_sellers)
-        generated_customers = await self._generate_customers(customers)
-        generated_orders = await self._generate_orders(orders, generated_customers, generated_products)
+        generated_orders = await self._generate_orders(
+            orders, generated_customers, generated_products, pools, risk_by_customer_id
+        )
         
         # Generate returns and refunds
-        returns_count = int(orders * return_rate)
-        generated_returns = await self._generate_returns(returns_count, generated_orders)
+        generated_returns = await self._generate_returns(returns_count, generated_orders, pools, risk_by_customer_id)
         generated_refunds = await self._generate_refunds(generated_returns)
         
         # Update customer analytics
@@ -90,62 +182,113 @@ class ECommerceDataGenerator:
     async def _clear_existing_data(self):
         """Clear existing demo data"""
         collections = ['customers', 'sellers', 'products', 'orders', 'returns', 'refunds', 'fraud_patterns']
-        for collection in collections:
-            await self.db[collection].delete_many({})
+        await asyncio.gather(*(self.db[collection].delete_many({}) for collection in collections))
+    
+    def _prebuild_pools(self, sellers: int, customers: int, orders: int, returns: int) -> Dict[str, List[str]]:
+        """Pre-generate Faker text fields so build loops only index into lists"""
+        return {
+            "company_names": [fake.company() for _ in range(sellers)],
+            "company_emails": [fake.company_email() for _ in range(sellers)],
+            "emails": [fake.email() for _ in range(customers)],
+            "first_names": [fake.first_name() for _ in range(customers)],
+            "last_names": [fake.last_name() for _ in range(customers)],
+            "phones": [fake.phone_number() for _ in range(customers)],
+            "addresses": [fake.address() for _ in range(orders)],
+            "descriptions": fake.texts(nb_texts=min(returns, DESCRIPTION_POOL_SIZE), max_nb_chars=200)
+        }
+    
+    async def _insert_many(self, collection: str, documents: List[Dict]):
+        """Bulk insert generated documents in concurrent unordered chunks"""
+        if not documents:
+            return
+        
+        chunk_size = -(-len(documents) // INSERT_CONCURRENCY)
+        await asyncio.gather(*(
+            self.db[collection].insert_many(
+                documents[start:start + chunk_size], ordered=False, bypass_document_validation=True
+            )
+            for start in range(0, len(documents), chunk_size)
+        ))
     
-    async def _generate_sellers(self, count: int) -> List[Dict]:
+    async def _generate_sellers(self, count: int, pools: Dict[str, List[str]]) -> List[Dict]:
         """Generate seller data"""
+        sellers = await asyncio.to_thread(self._build_sellers, count, pools)
+        await self._insert_many('sellers', sellers)
+        return sellers
+    
+    def _build_sellers(self, count: int, pools: Dict[str, List[str]]) -> List[Dict]:
+        """Build seller documents"""
         sellers = []
+        now = datetime.utcnow()
         
-        for _ in range(count):
-            seller = Seller(
-                name=fake.company(),
-                email=fake.company_email(),
-                rating=round(random.uniform(3.5, 5.0), 1)
-            )
-            sellers.append(seller.dict())
+        for i in range(count):
+            sellers.append({
+                "id": uuid.uuid4(),
+                "name": pools["company_names"][i],
+                "email": pools["company_emails"][i],
+                "rating": round(random.uniform(3.5, 5.0), 1),
+                "total_sales": 0.0,
+                "return_rate": 0.0,
+                "fraud_score": 0.0,
+                "created_at": now
+            })
         
-        if sellers:
-            await self.db.sellers.insert_many(sellers)
         return sellers
     
     async def _generate_products(self, count: int, sellers: List[Dict]) -> List[Dict]:
         """Generate product data"""
+        products = await asyncio.to_thread(self._build_products, count, sellers)
+        await self._insert_many('products', products)
+        return products
+    
+    def _build_products(self, count: int, sellers: List[Dict]) -> List[Dict]:
+        """Build product documents"""
         products = []
+        now = datetime.utcnow()
         
-        for _ in range(count):
-            category = random.choice(list(self.categories.keys()))
-            subcategory = random.choice(self.categories[category])
-            
-            # Price based on category
-            if category == "Electronics":
-                price = round(random.uniform(50, 2000), 2)
-            elif category == "Clothing":
-                price = round(random.uniform(15, 300), 2)
-            else:
-                price = round(random.uniform(10, 500), 2)
-            
-            cost = round(price * random.uniform(0.3, 0.7), 2)
-            margin = round(((price - cost) / price) * 100, 2)
+        category_indices = self.rng.integers(len(self._cat_keys), size=count)
+        
+        # Price based on category
+        prices = np.round(
+            self.rng.uniform(self._price_low[category_indices], self._price_high[category_indices]), 2
+        )
+        
+        costs = np.round(prices * self.rng.uniform(0.3, 0.7, size=count), 2)
+        margins = np.round(((prices - costs) / prices) * 100, 2)
+        
+        for category_index, price, cost, margin in zip(category_indices.tolist(), prices.tolist(),
+                                                       costs.tolist(), margins.tolist()):
+            category = self._cat_keys[category_index]
+            subcategory = random.choice(self._subcategories[category_index])
             
-            product = Product(
-                name=f"{fake.catch_phrase()} {subcategory}",
-                category=category,
-                sub_category=subcategory,
-                price=price,
-                cost=cost,
-                margin=margin,
-                seller_id=random.choice(sellers)['id']
-            )
-            products.append(product.dict())
+            products.append({
+                "id": uuid.uuid4(),
+                "name": f"{fake.catch_phrase()} {subcategory}",
+                "category": category,
+                "sub_category": subcategory,
+                "price": price,
+                "cost": cost,
+                "margin": margin,
+                "seller_id": random.choice(sellers)['id'],
+                "return_rate": 0.0,
+                "fraud_return_rate": 0.0,
+                "created_at": now
+            })
         
-        if products:
-            await self.db.products.insert_many(products)
         return products
     
-    async def _generate_customers(self, count: int) -> List[Dict]:
+    async def _generate_customers(self, count: int, pools: Dict[str, List[str]],
+                                  risk_by_customer_id: Dict[uuid.UUID, str]) -> List[Dict]:
         """Generate customer data with varied risk profiles"""
+        customers = await asyncio.to_thread(self._build_customers, count, pools, risk_by_customer_id)
+        await self._insert_many('customers', customers)
+        return customers
+    
+    def _build_customers(self, count: int, pools: Dict[str, List[str]],
+                         risk_by_customer_id: Dict[uuid.UUID, str]) -> List[Dict]:
+        """Build customer documents, recording each customer's risk persona in risk_by_customer_id"""
         customers = []
+        now = datetime.utcnow()
         
         for i in range(count):
             # Create different customer personas
@@ -156,110 +299,119 @@ class ECommerceDataGenerator:
             else:  # 85% low-risk customers
                 risk_profile = "low_risk"
             
-            customer = Customer(
-                email=fake.email(),
-                first_name=fake.first_name(),
-                last_name=fake.last_name(),
-                phone=fake.phone_number(),
-                registration_date=fake.date_time_between(start_date='-2y', end_date='now')
-            )
+            customer_id = uuid.uuid4()
+            risk_by_customer_id[customer_id] = risk_profile
             
-            # Add risk profile as metadata (will be used in order generation)
-            customer_dict = customer.dict()
-            customer_dict['_risk_profile'] = risk_profile
-            customers.append(customer_dict)
+            customers.append({
+                "id": customer_id,
+                "email": pools["emails"][i],
+                "first_name": pools["first_names"][i],
+                "last_name": pools["last_names"][i],
+                "phone": pools["phones"][i],
+                "registration_date": fake.date_time_between(start_date='-2y', end_date='now'),
+                "total_orders": 0,
+                "total_returns": 0,
+                "return_rate": 0.0,
+                "fraud_score": 0.0,
+                "risk_level": RiskLevel.LOW.value,
+                "is_blacklisted": False,
+                "created_at": now
+            })
         
-        if customers:
-            await self.db.customers.insert_many(customers)
         return customers
     
-    async def _generate_orders(self, count: int, customers: List[Dict], products: List[Dict]) -> List[Dict]:
+    async def _generate_orders(self, count: int, customers: List[Dict], products: List[Dict],
+                               pools: Dict[str, List[str]], risk_by_customer_id: Dict[uuid.UUID, str]) -> List[Dict]:
         """Generate order data"""
+        orders = await asyncio.to_thread(self._build_orders, count, customers, products, pools, risk_by_customer_id)
+        await self._insert_many('orders', orders)
+        return orders
+    
+    def _build_orders(self, count: int, customers: List[Dict], products: List[Dict],
+                      pools: Dict[str, List[str]], risk_by_customer_id: Dict[uuid.UUID, str]) -> List[Dict]:
+        """Build order documents"""
         orders = []
+        now = datetime.utcnow()
         
-        for _ in range(count):
-            customer = random.choice(customers)
+        order_customers = [customers[i] for i in self.rng.integers(len(customers), size=count)]
             
-            # Number of items based on customer risk profile
-            risk_profile = customer.get('_risk_profile', 'low_risk')
-            if risk_profile == 'high_risk':
-                num_items = random.randint(1, 3)
-                order_multiplier = random.uniform(1.2, 2.0)  # Higher value orders
-            else:
-                num_items = random.randint(1, 4)
-                order_multiplier = random.uniform(0.8, 1.2)
+        # Number of items and order value based on customer risk profile
+        high_risk = np.array([risk_by_customer_id.get(c['id'], 'low_risk') == 'high_risk' for c in order_customers], dtype=bool)
+        item_counts = self.rng.integers(1, np.where(high_risk, 4, 5)).tolist()
+        multipliers = self.rng.uniform(
+            np.where(high_risk, 1.2, 0.8),  # Higher value orders for high-risk customers
+            np.where(high_risk, 2.0, 1.2)
+        ).tolist()
+        quantities = self.rng.integers(1, 3, size=(count, 4)).tolist()
             
+        for customer, num_items, order_multiplier, order_quantities, shipping_address in zip(
+                order_customers, item_counts, multipliers, quantities, pools["addresses"]):
             # Select random products
             order_products = random.sample(products, min(num_items, len(products)))
             
             items = []
             total_amount = 0
             
-            for product in order_products:
-                quantity = random.randint(1, 2)
+            for product, quantity in zip(order_products, order_quantities):
                 unit_price = product['price'] * order_multiplier
                 total_price = unit_price * quantity
                 
-                item = OrderItem(
-                    product_id=product['id'],
-                    product_name=product['name'],
-                    quantity=quantity,
-                    unit_price=unit_price,
-                    total_price=total_price
-                )
-                items.append(item)
+                items.append({
+                    "product_id": product['id'],
+                    "product_name": product['name'],
+                    "quantity": quantity,
+                    "unit_price": unit_price,
+                    "total_price": total_price
+                })
                 total_amount += total_price
             
             # Order date in the last 6 months
             order_date = fake.date_time_between(start_date='-6M', end_date='now')
             
-            order = Order(
-                customer_id=customer['id'],
-                customer_email=customer['email'],
-                items=items,
-                total_amount=round(total_amount, 2),
-                order_date=order_date,
-                status=random.choice([OrderStatus.DELIVERED, OrderStatus.SHIPPED]),
-                shipping_address=fake.address(),
-                payment_method=random.choice(['Credit Card', 'Debit Card', 'PayPal', 'Apple Pay'])
-            )
-            
-            orders.append(order.dict())
+            orders.append({
+                "id": uuid.uuid4(),
+                "customer_id": customer['id'],
+                "customer_email": customer['email'],
+                "items": items,
+                "total_amount": round(total_amount, 2),
+                "order_date": order_date,
+                "status": random.choice(ORDER_STATUS_CHOICES),
+                "shipping_address": shipping_address,
+                "payment_method": random.choice(PAYMENT_METHODS),
+                "is_returned": False,
+                "return_date": None,
+                "created_at": now
+            })
         
-        if orders:
-            await self.db.orders.insert_many(orders)
         return orders
     
-    async def _generate_returns(self, count: int, orders: List[Dict]) -> List[Dict]:
+    async def _generate_returns(self, count: int, orders: List[Dict], pools: Dict[str, List[str]],
+                                risk_by_customer_id: Dict[uuid.UUID, str]) -> List[Dict]:
         """Generate return data with realistic fraud patterns"""
+        returns = await asyncio.to_thread(self._build_returns, count, orders, pools, risk_by_customer_id)
+        await self._insert_many('returns', returns)
+        return returns
+    
+    def _build_returns(self, count: int, orders: List[Dict], pools: Dict[str, List[str]],
+                       risk_by_customer_id: Dict[uuid.UUID, str]) -> List[Dict]:
+        """Build return documents"""
         returns = []
+        now = datetime.utcnow()
+        delivered = OrderStatus.DELIVERED.value
         
         # Select orders for returns (only delivered orders)
-        eligible_orders = [o for o in orders if o['status'] == OrderStatus.DELIVERED]
-        selected_orders = random.sample(eligible_orders, min(count, len(eligible_orders)))
+        selected_orders = algorithm_l_sample(
+            (o for o in orders if o['status'] == delivered), count
+        )
+        descriptions = pools["descriptions"]
+        description_indices = self.rng.integers(len(descriptions), size=len(selected_orders)).tolist()
         
-        for order in selected_orders:
-            # Get customer risk profile
-            customer = await self.db.customers.find_one({"id": order['customer_id']})
-            risk_profile = customer.get('_risk_profile', 'low_risk') if customer else 'low_risk'
-            
-            # Select return reason based on risk profile
-            if risk_profile == 'high_risk':
-                # High-risk customers more likely to use suspicious reasons
-                reason_weights = {
-                    ReturnReason.CHANGED_MIND: 0.4,
-                    ReturnReason.NOT_AS_DESCRIBED: 0.3,
-                    ReturnReason.SIZE_ISSUE: 0.15,
-                    ReturnReason.DEFECTIVE: 0.15
-                }
-            else:
-                reason_weights = self.return_reasons_weights
-            
-            reason = random.choices(
-                list(reason_weights.keys()),
-                weights=list(reason_weights.values())
-            )[0]
+        # Get customer risk profiles and select return reasons based on them
+        risk_profiles = [risk_by_customer_id.get(order['customer_id'], 'low_risk') for order in selected_orders]
+        reasons = self._sample_return_reasons(risk_profiles)
             
+        for order, risk_profile, reason, description_index in zip(
+                selected_orders, risk_profiles, reasons, description_indices):
             # Select item to return
             item = random.choice(order['items'])
             quantity_returned = random.randint(1, item['quantity'])
@@ -267,6 +419,8 @@ class ECommerceDataGenerator:
             
             # Return date after order date
             return_date = order['order_date'] + timedelta(days=random.randint(1, 30))
+            delivery_date = order.get('updated_at', order['order_date'])
+            is_rapid_return = return_date - delivery_date <= RAPID_RETURN_WINDOW
             
             # Determine if fraud is suspected
             fraud_probability = self.fraud_probability.get(reason, 0.05)
@@ -274,7 +428,7 @@ class ECommerceDataGenerator:
                 fraud_probability *= 3  # 3x more likely for high-risk customers
             
             is_fraud_suspected = random.random() < fraud_probability
-            fraud_score = 0
+            fraud_score = 0.0
             fraud_indicators = []
             
             if is_fraud_suspected:
@@ -287,124 +441,123 @@ class ECommerceDataGenerator:
             # Processing time (fraud cases take longer)
             processing_days = random.randint(1, 14) if not is_fraud_suspected else random.randint(7, 21)
             
-            return_obj = Return(
-                order_id=order['id'],
-                customer_id=order['customer_id'],
-                customer_email=order['customer_email'],
-                product_id=item['product_id'],
-                product_name=item['product_name'],
-                quantity_returned=quantity_returned,
-                reason=reason,
-                description=fake.text(max_nb_chars=200),
-                return_date=return_date,
-                refund_amount=refund_amount,
-                is_fraud_suspected=is_fraud_suspected,
-                fraud_score=fraud_score,
-                fraud_indicators=fraud_indicators,
-                processing_time_days=processing_days
-            )
-            
-            returns.append(return_obj.dict())
+            returns.append({
+                "id": uuid.uuid4(),
+                "order_id": order['id'],
+                "customer_id": order['customer_id'],
+                "customer_email": order['customer_email'],
+                "product_id": item['product_id'],
+                "product_name": item['product_name'],
+                "quantity_returned": quantity_returned,
+                "reason": reason,
+                "description": descriptions[description_index],
+                "return_date": return_date,
+                "refund_amount": refund_amount,
+                "is_fraud_suspected": is_fraud_suspected,
+                "is_rapid_return": is_rapid_return,
+                "fraud_score": fraud_score,
+                "fraud_indicators": fraud_indicators,
+                "processing_time_days": processing_days,
+                "created_at": now
+            })
         
-        if returns:
-            await self.db.returns.insert_many(returns)
         return returns
     
     async def _generate_refunds(self, returns: List[Dict]) -> List[Dict]:
         """Generate refund data"""
+        refunds = await asyncio.to_thread(self._build_refunds, returns)
+        await self._insert_many('refunds', refunds)
+        return refunds
+    
+    def _build_refunds(self, returns: List[Dict]) -> List[Dict]:
+        """Build refund documents"""
         refunds = []
+        now = datetime.utcnow()
         
         for return_data in returns:
             # Most returns get refunds, but fraud cases might be rejected
             if return_data['is_fraud_suspected'] and random.random() < 0.3:
-                status = RefundStatus.REJECTED
+                status = RefundStatus.REJECTED.value
                 processed_date = None
                 processing_time = None
             else:
-                status = random.choice([RefundStatus.PROCESSED, RefundStatus.APPROVED])
+                status = random.choice(REFUND_STATUS_CHOICES)
                 processed_date = return_data['return_date'] + timedelta(days=return_data['processing_time_days'])
                 processing_time = return_data['processing_time_days']
             
-            refund = Refund(
-                return_id=return_data['id'],
-                order_id=return_data['order_id'],
-                customer_id=return_data['customer_id'],
-                amount=return_data['refund_amount'],
-                status=status,
-                requested_date=return_data['return_date'],
-                processed_date=processed_date,
-                processing_time_days=processing_time,
-                refund_method=random.choice(['Original Payment Method', 'Store Credit', 'Bank Transfer'])
-            )
-            
-            refunds.append(refund.dict())
+            refunds.append({
+                "id": uuid.uuid4(),
+                "return_id": return_data['id'],
+                "order_id": return_data['order_id'],
+                "customer_id": return_data['customer_id'],
+                "amount": return_data['refund_amount'],
+                "status": status,
+                "requested_date": return_data['return_date'],
+                "processed_date": processed_date,
+                "processing_time_days": processing_time,
+                "refund_method": random.choice(REFUND_METHODS),
+                "created_at": now
+            })
         
-        if refunds:
-            await self.db.refunds.insert_many(refunds)
         return refunds
     
     async def _update_customer_analytics(self):
-        """Update customer analytics and risk scores"""
+        """Update customer analytics and risk scores in a single server-side pipeline"""
         
-        # Update customer return rates and totals
         pipeline = [
-            {"$group": {
-                "_id": "$customer_id",
-                "total_orders": {"$sum": 1},
-                "total_amount": {"$sum": "$total_amount"}
-            }}
-        ]
-        
-        order_stats = await self.db.orders.aggregate(pipeline).to_list(10000)
-        order_stats_dict = {stat['_id']: stat for stat in order_stats}
-        
-        # Get return stats
-        return_pipeline = [
-            {"$group": {
-                "_id": "$customer_id",
-                "total_returns": {"$sum": 1},
-                "total_refunds": {"$sum": "$refund_amount"},
-                "fraud_returns": {"$sum": {"$cond": ["$is_fraud_suspected", 1, 0]}}
-            }}
-        ]
-        
-        return_stats = await self.db.returns.aggregate(return_pipeline).to_list(10000)
-        return_stats_dict = {stat['_id']: stat for stat in return_stats}
-        
-        # Update each customer
-        customers = await self.db.customers.find().to_list(10000)
-        
-        for customer in customers:
-            customer_id = customer['id']
-            
-            order_data = order_stats_dict.get(customer_id, {'total_orders': 0, 'total_amount': 0})
-            return_data = return_stats_dict.get(customer_id, {'total_returns': 0, 'fraud_returns': 0})
-            
-            total_orders = order_data['total_orders']
-            total_returns = return_data['total_returns']
-            return_rate = total_returns / total_orders if total_orders > 0 else 0
+            # Join each customer's orders and returns (ids only) to count them
+            {"$lookup": {
+                "from": "orders",
+                "localField": "id",
+                "foreignField": "customer_id",
+                "pipeline": [{"$project": {"_id": 1}}],
+                "as": "customer_orders"
+            }},
+            {"$lookup": {
+                "from": "returns",
+                "localField": "id",
+                "foreignField": "customer_id",
+                "pipeline": [{"$project": {"_id": 1}}],
+                "as": "customer_returns"
+            }},
+            {"$project": {
+                "total_orders": {"$size": "$customer_orders"},
+                "total_returns": {"$size": "$customer_returns"}
+            }},
+            {"$addFields": {
+                "return_rate": {"$cond": [
+                    {"$gt": ["$total_orders", 0]},
+                    {"$divide": ["$total_returns", "$total_orders"]},
+                    0
+                ]}
+            }},
             
             # Calculate fraud score
-            fraud_score = 0
-            risk_level = RiskLevel.LOW
-            
-            if return_rate > 0.3:
-                fraud_score = min(100, return_rate * 200)
-                if fraud_score >= 70:
-                    risk_level = RiskLevel.CRITICAL
-                elif fraud_score >= 50:
-                    risk_level = RiskLevel.HIGH
-                elif fraud_score >= 25:
-                    risk_level = RiskLevel.MEDIUM
-            
-            # Update customer record
-            await self.db.customers.update_one(
-                {"id": customer_id},
-                {"$set": {
-                    "total_orders": total_orders,
-                    "total_returns": total_returns,
-                    "return_rate": return_rate,
-                    "fraud_score": fraud_score,
-                    "risk_level": risk_level
+            {"$addFields": {
+                "fraud_score": {"$cond": [
+                    {"$gt": ["$return_rate", 0.3]},
+                    {"$min": [100, {"$multiply": ["$return_rate", 200]}]},
+                    0
+                ]}
+            }},
+            {"$addFields": {
+                "risk_level": {"$switch": {
+                    "branches": [
+                        {"case": {"$gte": ["$fraud_score", 70]}, "then": RiskLevel.CRITICAL.value},
+                        {"case": {"$gte": ["$fraud_score", 50]}, "then": RiskLevel.HIGH.value},
+                        {"case": {"$gte": ["$fraud_score", 25]}, "then": RiskLevel.MEDIUM.value}
+                    ],
+                    "default": RiskLevel.LOW.value
                 }}
-            )
\ No newline at end of file
+            }},
+            
+            # Write the analytics fields back onto each customer record
+            {"$merge": {
+                "into": "customers",
+                "on": "_id",
+                "whenMatched": "merge",
+                "whenNotMatched": "discard"
+            }}
+        ]
+        
+        await self.db.customers.aggregate(pipeline).to_list(None)
\ No newline at end of file
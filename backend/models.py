@@ -34,7 +34,7 @@ class RiskLevel(str, Enum):
 
 # Customer Model
 class Customer(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: uuid.UUID = Field(default_factory=uuid.uuid4)
     email: str
     first_name: str
     last_name: str
@@ -56,14 +56,14 @@ class CustomerCreate(BaseModel):
 
 # Product Model
 class Product(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: uuid.UUID = Field(default_factory=uuid.uuid4)
     name: str
     category: str
     sub_category: Optional[str] = None
     price: float
     cost: float
     margin: float
-    seller_id: str
+    seller_id: uuid.UUID
     return_rate: float = 0.0
     fraud_return_rate: float = 0.0
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -74,11 +74,11 @@ class ProductCreate(BaseModel):
     sub_category: Optional[str] = None
     price: float
     cost: float
-    seller_id: str
+    seller_id: uuid.UUID
 
 # Seller Model
 class Seller(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: uuid.UUID = Field(default_factory=uuid.uuid4)
     name: str
     email: str
     rating: float = 5.0
@@ -94,15 +94,15 @@ class SellerCreate(BaseModel):
 
 # Order Model
 class OrderItem(BaseModel):
-    product_id: str
+    product_id: uuid.UUID
     product_name: str
     quantity: int
     unit_price: float
     total_price: float
 
 class Order(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    customer_id: str
+    id: uuid.UUID = Field(default_factory=uuid.uuid4)
+    customer_id: uuid.UUID
     customer_email: str
     items: List[OrderItem]
     total_amount: float
@@ -115,18 +115,18 @@ class Order(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class OrderCreate(BaseModel):
-    customer_id: str
+    customer_id: uuid.UUID
     items: List[OrderItem]
     shipping_address: str
     payment_method: str
 
 # Return Model
 class Return(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    order_id: str
-    customer_id: str
+    id: uuid.UUID = Field(default_factory=uuid.uuid4)
+    order_id: uuid.UUID
+    customer_id: uuid.UUID
     customer_email: str
-    product_id: str
+    product_id: uuid.UUID
     product_name: str
     quantity_returned: int
     reason: ReturnReason
@@ -134,24 +134,25 @@ class Return(BaseModel):
     return_date: datetime = Field(default_factory=datetime.utcnow)
     refund_amount: float
     is_fraud_suspected: bool = False
+    is_rapid_return: bool = False  # Returned within 24 hours of delivery
     fraud_score: float = 0.0
     fraud_indicators: List[str] = []
     processing_time_days: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class ReturnCreate(BaseModel):
-    order_id: str
-    product_id: str
+    order_id: uuid.UUID
+    product_id: uuid.UUID
     quantity_returned: int
     reason: ReturnReason
     description: Optional[str] = None
 
 # Refund Model
 class Refund(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    return_id: str
-    order_id: str
-    customer_id: str
+    id: uuid.UUID = Field(default_factory=uuid.uuid4)
+    return_id: uuid.UUID
+    order_id: uuid.UUID
+    customer_id: uuid.UUID
     amount: float
     status: RefundStatus = RefundStatus.PENDING
     requested_date: datetime = Field(default_factory=datetime.utcnow)
@@ -161,13 +162,13 @@ class Refund(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class RefundCreate(BaseModel):
-    return_id: str
+    return_id: uuid.UUID
     refund_method: str
 
 # Analytics Models
 class FraudPattern(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    customer_id: str
+    id: uuid.UUID = Field(default_factory=uuid.uuid4)
+    customer_id: str  # Customer UUID, or "SYSTEM" for product-level patterns
     pattern_type: str
     description: str
     severity: RiskLevel
@@ -188,7 +189,7 @@ class AnalyticsMetrics(BaseModel):
     date_range: Dict[str, str]
 
 class CustomerRiskProfile(BaseModel):
-    customer_id: str
+    customer_id: uuid.UUID
     email: str
     risk_score: float
     risk_level: RiskLevel
@@ -202,13 +203,16 @@ class CustomerRiskProfile(BaseModel):
 class QueryFilter(BaseModel):
     start_date: Optional[date] = None
     end_date: Optional[date] = None
-    customer_ids: Optional[List[str]] = None
+    customer_ids: Optional[List[uuid.UUID]] = None
     product_categories: Optional[List[str]] = None
     return_reasons: Optional[List[str]] = None
     fraud_risk_levels: Optional[List[str]] = None
     min_order_value: Optional[float] = None
     max_order_value: Optional[float] = None
 
+class FraudScoreRequest(BaseModel):
+    customer_ids: List[uuid.UUID] = Field(..., min_length=1, max_length=1000)
+
 class ExportRequest(BaseModel):
     export_type: str  # 'csv', 'json', 'excel'
     data_type: str   # 'orders', 'returns', 'customers', 'analytics'
@@ -1,45 +1,131 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Query, BackgroundTasks
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse, ORJSONResponse, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+from pymongo import IndexModel
+from pymongo.errors import PyMongoError
 import os
+import time
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple, Type, Union, get_args, get_origin
 import uuid
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, timedelta, timezone
 import csv
-import json
 import io
-import pandas as pd
+import orjson
 
 # Import our models and engines
 from models import (
-    Customer, Product, Seller, Order, Return, Refund,
+    Customer, Product, Seller, Order, OrderItem, Return, Refund,
     CustomerCreate, ProductCreate, SellerCreate, OrderCreate, ReturnCreate, RefundCreate,
     AnalyticsMetrics, CustomerRiskProfile, FraudPattern, QueryFilter, ExportRequest, ExportResponse,
+    FraudScoreRequest,
     OrderStatus, ReturnReason, RefundStatus, RiskLevel
 )
-from analytics import AnalyticsEngine, FraudDetectionEngine
+from analytics import AnalyticsEngine, FraudDetectionEngine, build_date_range, compile_fraud_score_kernel
 from data_generator import ECommerceDataGenerator
+from cache import TTLCache
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; only the Parquet export needs it
+    pa = pq = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    uuidRepresentation='standard',
+    # Keep warm connections for bursts of concurrent inserts and aggregations
+    maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', '50')),
+    minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', '10')),
+    maxIdleTimeMS=int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '30000')),
+    # Fail fast instead of queueing indefinitely when the pool or cluster is unavailable
+    waitQueueTimeoutMS=int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000')),
+    serverSelectionTimeoutMS=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '3000')),
+    # Wire compression, negotiated with the server in order of preference
+    compressors=os.environ.get('MONGO_COMPRESSORS', 'zstd,zlib')
+)
 db = client[os.environ['DB_NAME']]
 
+# Target size of each chunk written to streamed export responses
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Response header carrying the keyset cursor for the next page of a list endpoint
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+OBJECT_ID_PATTERN = "^[0-9a-fA-F]{24}$"
+
+# Export filename timestamp, formatted at most once per second
+_stamp_cache: List[Any] = [0, ""]
+
+def fast_utc_stamp() -> str:
+    """Return the current UTC time as YYYYmmdd_HHMMSS, reusing the string within the same second"""
+    now = int(time.time())
+    if now != _stamp_cache[0]:
+        _stamp_cache[0] = now
+        _stamp_cache[1] = time.strftime("%Y%m%d_%H%M%S", time.gmtime(now))
+    return _stamp_cache[1]
+
+# Documents fetched per cursor round-trip when streaming exports
+EXPORT_BATCH_SIZE = 2000
+
+# ISO 8601 with milliseconds, matching the precision MongoDB stores dates with
+EXPORT_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%L"
+
+# Date field the export date filters apply to; other collections filter on created_at
+EXPORT_DATE_FIELDS = {"orders": "order_date", "returns": "return_date"}
+
+COLLECTION_MODELS: Dict[str, Type[BaseModel]] = {
+    "customers": Customer,
+    "orders": Order,
+    "returns": Return,
+    "refunds": Refund
+}
+
+def _model_projection(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Build a projection limited to a model's fields, without the MongoDB _id"""
+    return {"_id": 0, **{field: 1 for field in model.model_fields}}
+
+def _export_projection(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Like _model_projection, with datetime fields formatted as strings by MongoDB"""
+    projection = _model_projection(model)
+    for field, info in model.model_fields.items():
+        if info.annotation is datetime or datetime in get_args(info.annotation):
+            projection[field] = {"$dateToString": {"date": f"${field}", "format": EXPORT_DATE_FORMAT}}
+    return projection
+
+# Fields fetched per collection, so list and export queries skip anything the models don't declare
+PROJECTIONS = {name: _model_projection(model) for name, model in COLLECTION_MODELS.items()}
+EXPORT_PROJECTIONS = {name: _export_projection(model) for name, model in COLLECTION_MODELS.items()}
+
 # Initialize engines
 analytics_engine = AnalyticsEngine(db)
 fraud_engine = FraudDetectionEngine(db)
 data_generator = ECommerceDataGenerator(db)
 
+# Short-lived caches for dashboard polling; concurrent identical requests share one computation
+dashboard_cache = TTLCache(ttl=float(os.environ.get('DASHBOARD_CACHE_TTL', '30')))
+fraud_patterns_cache = TTLCache(ttl=float(os.environ.get('FRAUD_PATTERNS_CACHE_TTL', '30')), maxsize=1)
+
+# Export requests that recently matched nothing, so repeated clicks answer 404 without querying
+empty_export_cache = TTLCache(ttl=float(os.environ.get('EMPTY_EXPORT_CACHE_TTL', '30')))
+
 # Create the main app without a prefix
-app = FastAPI(title="E-Commerce Return & Fraud Analysis API", version="1.0.0")
+app = FastAPI(
+    title="E-Commerce Return & Fraud Analysis API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse
+)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -69,10 +155,11 @@ async def create_status_check(input: StatusCheckCreate):
     _ = await db.status_checks.insert_one(status_obj.dict())
     return status_obj
 
-@api_router.get("/status", response_model=List[StatusCheck])
+@api_router.get("/status", responses={200: {"model": List[StatusCheck]}})
 async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+    status_checks = await db.status_checks.find(projection={"_id": 0}).to_list(1000)
+    # Documents were validated on insert; documented via `responses` so FastAPI does not re-validate them
+    return [StatusCheck.model_construct(**status_check) for status_check in status_checks]
 
 # ====================
 # DATA MANAGEMENT ENDPOINTS
@@ -95,6 +182,9 @@ async def generate_sample_data(
             orders=orders,
             return_rate=return_rate
         )
+        dashboard_cache.clear()
+        fraud_patterns_cache.clear()
+        empty_export_cache.clear()
         return {"success": True, "data": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Data generation failed: {str(e)}")
@@ -103,12 +193,12 @@ async def generate_sample_data(
 async def get_data_status():
     """Get current data status and counts"""
     try:
-        counts = {}
         collections = ['customers', 'sellers', 'products', 'orders', 'returns', 'refunds']
         
-        for collection in collections:
-            count = await db[collection].count_documents({})
-            counts[collection] = count
+        # Collection metadata counts, fetched concurrently
+        counts = dict(zip(collections, await asyncio.gather(
+            *(db[collection].estimated_document_count() for collection in collections)
+        )))
         
         return {"success": True, "data_counts": counts}
     except Exception as e:
@@ -126,24 +216,31 @@ async def get_dashboard_metrics(
     product_categories: Optional[str] = Query(None)
 ):
     """Get comprehensive dashboard metrics"""
+    # Parse filters
+    filters = QueryFilter()
+    if customer_ids:
+        try:
+            filters.customer_ids = [uuid.UUID(customer_id) for customer_id in customer_ids.split(',')]
+        except ValueError:
+            raise HTTPException(status_code=422, detail=f"Invalid customer_ids: {customer_ids}")
+    
     try:
-        # Parse filters
-        filters = QueryFilter()
         if start_date:
             filters.start_date = start_date
         if end_date:
             filters.end_date = end_date
-        if customer_ids:
-            filters.customer_ids = customer_ids.split(',')
         if product_categories:
             filters.product_categories = product_categories.split(',')
         
-        metrics = await analytics_engine.get_dashboard_metrics(filters)
+        metrics = await dashboard_cache.get_or_set(
+            filters.model_dump_json(),
+            lambda: analytics_engine.get_dashboard_metrics(filters)
+        )
         return metrics
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get dashboard metrics: {str(e)}")
 
-@api_router.get("/analytics/customer-risk-profiles", response_model=List[CustomerRiskProfile])
+@api_router.get("/analytics/customer-risk-profiles", responses={200: {"model": List[CustomerRiskProfile]}})
 async def get_customer_risk_profiles(limit: int = Query(100, ge=10, le=1000)):
     """Get customer risk profiles for fraud analysis"""
     try:
@@ -166,7 +263,7 @@ async def get_trend_analysis(days: int = Query(30, ge=7, le=365)):
 # ====================
 
 @api_router.get("/fraud/customer-score/{customer_id}")
-async def get_customer_fraud_score(customer_id: str):
+async def get_customer_fraud_score(customer_id: uuid.UUID):
     """Calculate fraud score for a specific customer"""
     try:
         score, indicators, risk_level = await fraud_engine.calculate_fraud_score(customer_id)
@@ -176,16 +273,36 @@ async def get_customer_fraud_score(customer_id: str):
             "fraud_score": score,
             "risk_level": risk_level,
             "fraud_indicators": indicators,
-            "timestamp": datetime.utcnow()
+            "timestamp": datetime.now(timezone.utc)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to calculate fraud score: {str(e)}")
 
+@api_router.post("/fraud/customer-scores")
+async def get_customer_fraud_scores(request: FraudScoreRequest):
+    """Calculate fraud scores for a batch of customers in one request"""
+    try:
+        scores = await fraud_engine.calculate_fraud_scores(request.customer_ids)
+        timestamp = datetime.now(timezone.utc)
+        
+        return [
+            {
+                "customer_id": customer_id,
+                "fraud_score": score,
+                "risk_level": risk_level,
+                "fraud_indicators": indicators,
+                "timestamp": timestamp
+            }
+            for customer_id, (score, indicators, risk_level) in zip(request.customer_ids, scores)
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to calculate fraud scores: {str(e)}")
+
 @api_router.get("/fraud/patterns", response_model=List[FraudPattern])
 async def detect_fraud_patterns():
     """Detect system-wide fraud patterns and anomalies"""
     try:
-        patterns = await fraud_engine.detect_anomalies()
+        patterns = await fraud_patterns_cache.get_or_set("patterns", fraud_engine.detect_anomalies)
         return patterns
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to detect fraud patterns: {str(e)}")
@@ -194,13 +311,15 @@ async def detect_fraud_patterns():
 # DATA QUERY ENDPOINTS
 # ====================
 
-@api_router.get("/data/customers", response_model=List[Customer])
+@api_router.get("/data/customers", responses={200: {"model": List[Customer]}})
 async def get_customers(
+    response: Response,
     limit: int = Query(100, ge=10, le=1000),
     risk_level: Optional[str] = Query(None),
-    min_return_rate: Optional[float] = Query(None)
+    min_return_rate: Optional[float] = Query(None),
+    after_id: Optional[str] = Query(None, pattern=OBJECT_ID_PATTERN)
 ):
-    """Get customers with optional filtering"""
+    """Get customers with optional filtering, paged by the X-Next-Cursor response header"""
     try:
         filter_query = {}
         if risk_level:
@@ -208,18 +327,21 @@ async def get_customers(
         if min_return_rate is not None:
             filter_query["return_rate"] = {"$gte": min_return_rate}
         
-        customers = await db.customers.find(filter_query).limit(limit).to_list(limit)
-        return [Customer(**customer) for customer in customers]
+        customers, next_cursor = await _find_documents("customers", filter_query, limit, after_id)
+        _set_next_cursor(response, next_cursor)
+        return [_construct_customer(customer) for customer in customers]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get customers: {str(e)}")
 
-@api_router.get("/data/returns", response_model=List[Return])
+@api_router.get("/data/returns", responses={200: {"model": List[Return]}})
 async def get_returns(
+    response: Response,
     limit: int = Query(100, ge=10, le=1000),
     fraud_suspected: Optional[bool] = Query(None),
-    return_reason: Optional[str] = Query(None)
+    return_reason: Optional[str] = Query(None),
+    after_id: Optional[str] = Query(None, pattern=OBJECT_ID_PATTERN)
 ):
-    """Get returns with optional filtering"""
+    """Get returns with optional filtering, paged by the X-Next-Cursor response header"""
     try:
         filter_query = {}
         if fraud_suspected is not None:
@@ -227,18 +349,21 @@ async def get_returns(
         if return_reason:
             filter_query["reason"] = return_reason
         
-        returns = await db.returns.find(filter_query).limit(limit).to_list(limit)
-        return [Return(**return_data) for return_data in returns]
+        returns, next_cursor = await _find_documents("returns", filter_query, limit, after_id)
+        _set_next_cursor(response, next_cursor)
+        return [_construct_return(return_data) for return_data in returns]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get returns: {str(e)}")
 
-@api_router.get("/data/orders", response_model=List[Order])
+@api_router.get("/data/orders", responses={200: {"model": List[Order]}})
 async def get_orders(
+    response: Response,
     limit: int = Query(100, ge=10, le=1000),
-    customer_id: Optional[str] = Query(None),
-    status: Optional[str] = Query(None)
+    customer_id: Optional[uuid.UUID] = Query(None),
+    status: Optional[str] = Query(None),
+    after_id: Optional[str] = Query(None, pattern=OBJECT_ID_PATTERN)
 ):
-    """Get orders with optional filtering"""
+    """Get orders with optional filtering, paged by the X-Next-Cursor response header"""
     try:
         filter_query = {}
         if customer_id:
@@ -246,11 +371,73 @@ async def get_orders(
         if status:
             filter_query["status"] = status
         
-        orders = await db.orders.find(filter_query).limit(limit).to_list(limit)
-        return [Order(**order) for order in orders]
+        orders, next_cursor = await _find_documents("orders", filter_query, limit, after_id)
+        _set_next_cursor(response, next_cursor)
+        return [_construct_order(order) for order in orders]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get orders: {str(e)}")
 
+@api_router.get("/data/bundle")
+async def get_data_bundle(limit: int = Query(100, ge=10, le=1000)):
+    """Get customers, returns and orders together, queried concurrently"""
+    try:
+        (customers, _), (returns, _), (orders, _) = await asyncio.gather(
+            _find_documents("customers", {}, limit),
+            _find_documents("returns", {}, limit),
+            _find_documents("orders", {}, limit)
+        )
+        
+        return {
+            "customers": [_construct_customer(customer) for customer in customers],
+            "returns": [_construct_return(return_data) for return_data in returns],
+            "orders": [_construct_order(order) for order in orders]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get data bundle: {str(e)}")
+
+async def _find_documents(data_type: str, filter_query: Dict[str, Any], limit: int,
+                          after_id: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Fetch one page of model-projected documents in _id order, with the cursor for the next page"""
+    if after_id:
+        filter_query = {**filter_query, "_id": {"$gt": ObjectId(after_id)}}
+    
+    documents = await db[data_type].find(
+        filter_query, projection={**PROJECTIONS[data_type], "_id": 1}
+    ).sort("_id", 1).limit(limit).batch_size(limit).to_list(limit)
+    
+    # A full page means there may be more; the last _id is where the next page starts
+    next_cursor = str(documents[-1]["_id"]) if len(documents) == limit else None
+    for document in documents:
+        del document["_id"]
+    return documents, next_cursor
+
+# Stored documents were written in model shape, so list responses build models without
+# validating them. The routes document their model via `responses` rather than response_model,
+# which would make FastAPI dump and re-validate every row; enum fields and nested items are
+# converted here for serialization, and fields missing from legacy documents fall back to defaults
+
+def _construct_customer(document: Dict[str, Any]) -> Customer:
+    """Build a Customer from a trusted stored document"""
+    return Customer.model_construct(**{**document, "risk_level": RiskLevel(document.get("risk_level", RiskLevel.LOW))})
+
+def _construct_return(document: Dict[str, Any]) -> Return:
+    """Build a Return from a trusted stored document"""
+    reason = document.get("reason")
+    return Return.model_construct(**{**document, "reason": ReturnReason(reason) if reason is not None else None})
+
+def _construct_order(document: Dict[str, Any]) -> Order:
+    """Build an Order and its items from a trusted stored document"""
+    return Order.model_construct(**{
+        **document,
+        "status": OrderStatus(document.get("status", OrderStatus.PENDING)),
+        "items": [OrderItem.model_construct(**item) for item in document.get("items", [])]
+    })
+
+def _set_next_cursor(response: Response, next_cursor: Optional[str]):
+    """Expose the next page cursor on a list response when there is one"""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
 # ====================
 # EXPORT ENDPOINTS (Power BI / Tableau)
 # ====================
@@ -260,26 +447,22 @@ async def export_to_csv(request: ExportRequest):
     """Export data to CSV format for Power BI/Tableau"""
     try:
         # Get data based on type
-        data = await _get_export_data(request.data_type, request.filters)
+        first_row, rows = await _open_export(request)
         
-        # Convert to CSV
-        output = io.StringIO()
-        if data:
-            df = pd.DataFrame(data)
-            df.to_csv(output, index=False)
-            output.seek(0)
-            
+        if first_row is not None:
             # Create response
-            filename = f"{request.data_type}_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            filename = f"{request.data_type}_export_{fast_utc_stamp()}.csv"
             
             return StreamingResponse(
-                io.BytesIO(output.getvalue().encode('utf-8')),
+                _stream_csv(first_row, rows, _export_fieldnames(request.data_type, first_row)),
                 media_type="text/csv",
                 headers={"Content-Disposition": f"attachment; filename={filename}"}
             )
         else:
             raise HTTPException(status_code=404, detail="No data found for export")
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
 
@@ -288,77 +471,285 @@ async def export_to_json(request: ExportRequest):
     """Export data to JSON format"""
     try:
         # Get data based on type
-        data = await _get_export_data(request.data_type, request.filters)
+        first_row, rows = await _open_export(request)
         
-        if data:
-            filename = f"{request.data_type}_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        if first_row is not None:
+            filename = f"{request.data_type}_export_{fast_utc_stamp()}.json"
             
             return StreamingResponse(
-                io.BytesIO(json.dumps(data, default=str).encode('utf-8')),
+                _stream_json(first_row, rows),
                 media_type="application/json",
                 headers={"Content-Disposition": f"attachment; filename={filename}"}
             )
         else:
             raise HTTPException(status_code=404, detail="No data found for export")
             
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+
+@api_router.post("/export/parquet")
+async def export_to_parquet(request: ExportRequest):
+    """Export data to zstd-compressed Parquet, which Power BI and Tableau load natively"""
+    if pq is None:
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    
+    try:
+        # Get data based on type
+        first_row, rows = await _open_export(request)
+        
+        if first_row is not None:
+            filename = f"{request.data_type}_export_{fast_utc_stamp()}.parquet"
+            
+            # Collections get a fixed schema from their model; analytics metrics are inferred
+            model = COLLECTION_MODELS.get(request.data_type)
+            schema = _arrow_schema(model) if model else None
+            
+            return StreamingResponse(
+                _stream_parquet(first_row, rows, schema),
+                media_type="application/vnd.apache.parquet",
+                headers={"Content-Disposition": f"attachment; filename={filename}"}
+            )
+        else:
+            raise HTTPException(status_code=404, detail="No data found for export")
+            
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
 
-async def _get_export_data(data_type: str, filters: Optional[QueryFilter]) -> List[Dict]:
-    """Get data for export based on type and filters"""
+async def _open_export(request: ExportRequest) -> Tuple[Optional[Dict[str, Any]], AsyncIterator[Dict[str, Any]]]:
+    """Start an export and read its first row, which is None when nothing matches"""
+    key = f"{request.data_type}:{(request.filters or QueryFilter()).model_dump_json()}"
+    rows = _iter_export_data(request.data_type, request.filters)
+    if empty_export_cache.get(key):
+        return None, rows
+    
+    first_row = await anext(rows, None)
+    if first_row is None:
+        empty_export_cache.set(key, True)
+    return first_row, rows
+
+def _drain(buffer: io.StringIO) -> bytes:
+    """Return the buffered text as UTF-8 and reset the buffer"""
+    data = buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+def _export_fieldnames(data_type: str, first_row: Dict[str, Any]) -> List[str]:
+    """Columns of an export: every model field for collections, the metric keys for analytics"""
+    model = COLLECTION_MODELS.get(data_type)
+    # Model fields rather than the first row's keys, so fields missing from older documents are kept
+    return list(model.model_fields) if model else list(first_row.keys())
+
+async def _stream_csv(first_row: Dict[str, Any], rows: AsyncIterator[Dict[str, Any]],
+                      fieldnames: List[str]) -> AsyncIterator[bytes]:
+    """Encode export rows as CSV, yielding about EXPORT_CHUNK_SIZE bytes at a time"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore', lineterminator='\n')
+    writer.writeheader()
+    writer.writerow(first_row)
+    
+    async for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield _drain(buffer)
+    
+    yield _drain(buffer)
+
+async def _stream_json(first_row: Dict[str, Any], rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """Encode export rows as a JSON array, yielding about EXPORT_CHUNK_SIZE bytes at a time"""
+    # orjson encodes straight to bytes, so rows are appended without a text buffer
+    buffer = bytearray(b'[')
+    buffer += orjson.dumps(first_row, default=str)
+    
+    async for row in rows:
+        buffer += b','
+        buffer += orjson.dumps(row, default=str)
+        if len(buffer) >= EXPORT_CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    
+    buffer += b']'
+    yield bytes(buffer)
+
+def _arrow_type(annotation: Any) -> "pa.DataType":
+    """Map a model field annotation to the Arrow type of its exported value"""
+    if get_origin(annotation) is Union:
+        return _arrow_type(next(arg for arg in get_args(annotation) if arg is not type(None)))
+    if get_origin(annotation) is list:
+        return pa.list_(_arrow_type(get_args(annotation)[0]))
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return pa.struct(list(_arrow_schema(annotation)))
+    if annotation is bool:
+        return pa.bool_()
+    if annotation is int:
+        return pa.int64()
+    if annotation is float:
+        return pa.float64()
+    # Strings, enums, UUIDs and dates (already formatted by MongoDB) are exported as text
+    return pa.string()
+
+def _arrow_schema(model: Type[BaseModel]) -> "pa.Schema":
+    """Build the Arrow schema of a model's exported rows"""
+    return pa.schema([(field, _arrow_type(info.annotation)) for field, info in model.model_fields.items()])
+
+class _ParquetSink(io.RawIOBase):
+    """Write-only file that hands out what has been written so far, while tell() keeps the file offset"""
+    
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def drain(self) -> bytes:
+        """Return the bytes written since the last drain"""
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+async def _stream_parquet(first_row: Dict[str, Any], rows: AsyncIterator[Dict[str, Any]],
+                          schema: Optional["pa.Schema"]) -> AsyncIterator[bytes]:
+    """Encode export rows as Parquet, yielding one row group per EXPORT_BATCH_SIZE rows as it is written"""
+    sink = _ParquetSink()
+    writer = None
+    encoding = None  # Row group being encoded in a worker thread while the next batch is fetched
+    
+    def write_row_group(batch: List[Dict[str, Any]]):
+        nonlocal writer
+        if schema is None:
+            # Without a model schema, nested values (e.g. analytics breakdowns) are stored as JSON text
+            batch = [
+                {key: orjson.dumps(value).decode() if isinstance(value, (dict, list)) else value for key, value in row.items()}
+                for row in batch
+            ]
+        table = pa.Table.from_pylist(batch, schema=schema)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema, compression="zstd", compression_level=3, use_dictionary=True)
+        writer.write_table(table)
+    
+    try:
+        batch = [first_row]
+        async for row in rows:
+            batch.append(row)
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                # Row groups are written in order, one at a time, off the event loop
+                if encoding is not None:
+                    await encoding
+                    yield sink.drain()
+                encoding = asyncio.ensure_future(asyncio.to_thread(write_row_group, batch))
+                batch = []
+        
+        if encoding is not None:
+            await encoding
+            encoding = None
+        if batch:
+            await asyncio.to_thread(write_row_group, batch)
+        writer.close()
+        yield sink.drain()
+    finally:
+        # On failure or client disconnect, let the worker thread finish before closing the writer
+        if encoding is not None:
+            await asyncio.gather(encoding, return_exceptions=True)
+        if writer is not None and writer.is_open:
+            writer.close()
+
+def _to_export_value(value: Any) -> Any:
+    """Convert datetime and UUID values (including nested ones) to strings"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, list):
+        return [_to_export_value(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _to_export_value(v) for k, v in value.items()}
+    return value
+
+async def _iter_export_data(data_type: str, filters: Optional[QueryFilter]) -> AsyncIterator[Dict[str, Any]]:
+    """Yield export rows one at a time based on type and filters"""
     
     # Build MongoDB filter
     mongo_filter = {}
     if filters:
-        if filters.start_date:
-            date_field = "order_date" if data_type == "orders" else "return_date" if data_type == "returns" else "created_at"
-            mongo_filter[date_field] = {"$gte": datetime.combine(filters.start_date, datetime.min.time())}
-        if filters.end_date:
-            date_field = "order_date" if data_type == "orders" else "return_date" if data_type == "returns" else "created_at"
-            if date_field in mongo_filter:
-                mongo_filter[date_field]["$lte"] = datetime.combine(filters.end_date, datetime.max.time())
-            else:
-                mongo_filter[date_field] = {"$lte": datetime.combine(filters.end_date, datetime.max.time())}
+        date_range = build_date_range(filters.start_date, filters.end_date)
+        if date_range:
+            mongo_filter[EXPORT_DATE_FIELDS.get(data_type, "created_at")] = date_range
     
-    # Get data from appropriate collection
-    if data_type == "customers":
-        collection = db.customers
-    elif data_type == "orders":
-        collection = db.orders
-    elif data_type == "returns":
-        collection = db.returns
-    elif data_type == "refunds":
-        collection = db.refunds
-    elif data_type == "analytics":
-        # For analytics, return dashboard metrics
-        metrics = await analytics_engine.get_dashboard_metrics(filters)
-        return [metrics.dict()]
-    else:
-        raise ValueError(f"Unknown data type: {data_type}")
-    
-    # Fetch data
-    data = await collection.find(mongo_filter).limit(10000).to_list(10000)
+    if data_type == "analytics":
+        # For analytics, return dashboard metrics (shared with the dashboard endpoint's cache)
+        metrics = await dashboard_cache.get_or_set(
+            (filters or QueryFilter()).model_dump_json(),
+            lambda: analytics_engine.get_dashboard_metrics(filters)
+        )
+        yield metrics.dict()
+        return
     
-    # Remove MongoDB _id field and convert dates to strings
-    for item in data:
-        if '_id' in item:
-            del item['_id']
-        # Convert datetime objects to strings for JSON serialization
-        for key, value in item.items():
-            if isinstance(value, datetime):
-                item[key] = value.isoformat()
+    # Get data from appropriate collection
+    if data_type not in COLLECTION_MODELS:
+        raise HTTPException(status_code=400, detail=f"Unknown data type: {data_type}")
+    collection = db[data_type]
     
-    return data
+    # Stream model fields only; dates are formatted server-side, ids are converted here
+    pipeline = [
+        {"$match": mongo_filter},
+        {"$project": EXPORT_PROJECTIONS[data_type]}
+    ]
+    fields = COLLECTION_MODELS[data_type].model_fields
+    async for item in collection.aggregate(pipeline, batchSize=EXPORT_BATCH_SIZE):
+        # Rebuild in model field order, since $project appends computed date fields last
+        yield {field: _to_export_value(item[field]) for field in fields if field in item}
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Allowed CORS origins, parsed once; credentials are only allowed with an explicit origin list
+_cors_setting = os.environ.get('CORS_ORIGINS', '*')
+CORS_ORIGINS = ["*"] if _cors_setting.strip() == "*" else [
+    origin.strip() for origin in _cors_setting.split(',') if origin.strip()
+]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+    allow_credentials=CORS_ORIGINS != ["*"],
+    allow_origins=CORS_ORIGINS,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
+)
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """GZip responses, except on paths whose payload is already compressed"""
+    
+    def __init__(self, app, excluded_paths: Tuple[str, ...] = (), **kwargs):
+        super().__init__(app, **kwargs)
+        self.excluded_paths = excluded_paths
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+# Compress CSV/JSON exports and API responses; Parquet is already zstd-compressed
+app.add_middleware(
+    SelectiveGZipMiddleware,
+    excluded_paths=("/api/export/parquet",),
+    minimum_size=1024,
+    compresslevel=5
 )
 
 # Configure logging
@@ -367,6 +758,79 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+logger.info("CORS allowed origins: %s", ", ".join(CORS_ORIGINS))
+
+@app.on_event("startup")
+async def warm_up_connections():
+    """Ping MongoDB so the pool is connected before the first request arrives"""
+    try:
+        await client.admin.command("ping")
+    except PyMongoError as e:
+        # Keep serving; requests fail individually until MongoDB is reachable
+        logger.warning("MongoDB warm-up ping failed, continuing without a warm pool: %s", e)
+        return
+    
+    pool = client.options.pool_options
+    logger.info(
+        "MongoDB connection pool ready (maxPoolSize=%d, minPoolSize=%d, waitQueueTimeout=%ss)",
+        pool.max_pool_size, pool.min_pool_size, pool.wait_queue_timeout
+    )
+
+# Background Numba compile of the fraud score kernel, referenced so the task is not collected
+_kernel_compile_task: Optional[asyncio.Task] = None
+
+def _log_kernel_compile_failure(task: asyncio.Task):
+    """Log a failed kernel compile; fraud scoring keeps using the NumPy path"""
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Fraud score kernel compile failed, using NumPy scoring: %s", task.exception())
+
+@app.on_event("startup")
+async def warm_up_fraud_scoring():
+    """Start compiling the fraud score kernel in a worker thread; requests use NumPy scoring until it is ready"""
+    global _kernel_compile_task
+    _kernel_compile_task = asyncio.create_task(asyncio.to_thread(compile_fraud_score_kernel))
+    _kernel_compile_task.add_done_callback(_log_kernel_compile_failure)
+
+# Indexes backing the analytics, fraud detection, list and export queries, per collection
+INDEXES = {
+    "orders": [
+        IndexModel([("customer_id", 1), ("order_date", -1)]),
+        IndexModel([("order_date", -1)]),
+        IndexModel([("shipping_address", 1)]),
+        IndexModel([("items.product_id", 1), ("order_date", -1)]),
+        IndexModel([("status", 1), ("order_date", -1)]),
+        IndexModel([("customer_id", 1), ("status", 1), ("_id", 1)]),
+    ],
+    "returns": [
+        IndexModel([("customer_id", 1), ("return_date", -1)]),
+        IndexModel([("return_date", -1)]),
+        IndexModel([("product_id", 1)]),
+        IndexModel([("is_fraud_suspected", 1), ("return_date", -1)]),
+        IndexModel([("is_fraud_suspected", 1), ("reason", 1), ("_id", 1)]),
+    ],
+    "customers": [
+        IndexModel([("id", 1)], unique=True),
+        IndexModel([("risk_level", 1), ("_id", 1)]),
+        IndexModel([("created_at", -1)]),
+    ],
+    "products": [
+        IndexModel([("id", 1)], unique=True),
+    ],
+    "refunds": [
+        IndexModel([("requested_date", -1)]),
+        IndexModel([("created_at", -1)]),
+    ],
+}
+
+@app.on_event("startup")
+async def create_indexes():
+    """Create each collection's indexes in one command, logging failures instead of aborting startup"""
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except PyMongoError as e:
+            # Queries still work without the index, only slower
+            logger.warning("Failed to create indexes on %s: %s", collection, e)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():